@@ -1,10 +1,17 @@
 import os
 import json
 import re
-from datetime import datetime
+import copy
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
 from typing import Dict, List, Any, Optional
 import PyPDF2
 from docx import Document
+from docx.oxml.ns import qn
+from docx.table import Table
+from docx.text.paragraph import Paragraph
 from pptx import Presentation
 import requests
 
@@ -20,6 +27,99 @@ try:
 except ImportError:
     ANTHROPIC_AVAILABLE = False
 
+log = logging.getLogger(__name__)
+
+METRIC_KEYWORDS = [
+    'revenue', 'profit', 'cost', 'budget', 'roi', 'performance',
+    'efficiency', 'productivity', 'quality', 'satisfaction',
+    'completion rate', 'progress', 'milestone', 'target'
+]
+
+# One pattern per metric keyword, compiled once at import. Kept separate rather
+# than fused into one alternation so overlapping mentions ("performance target
+# exceeded") still yield a metric for each keyword
+METRIC_PATTERNS = [
+    (keyword, re.compile(re.escape(keyword) + r'[:\s]*([^.]+)', re.IGNORECASE))
+    for keyword in METRIC_KEYWORDS
+]
+
+# Rule-based extraction patterns, compiled once at import
+COMPLETED_PATTERNS = [
+    re.compile(r'completed?\s+([^.]+)', re.IGNORECASE),
+    re.compile(r'finished\s+([^.]+)', re.IGNORECASE),
+    re.compile(r'done\s+([^.]+)', re.IGNORECASE)
+]
+
+IN_PROGRESS_PATTERNS = [
+    re.compile(r'working on\s+([^.]+)', re.IGNORECASE),
+    re.compile(r'in progress\s+([^.]+)', re.IGNORECASE),
+    re.compile(r'currently\s+([^.]+)', re.IGNORECASE)
+]
+
+PENDING_PATTERNS = [
+    re.compile(r'planned?\s+([^.]+)', re.IGNORECASE),
+    re.compile(r'upcoming\s+([^.]+)', re.IGNORECASE),
+    re.compile(r'next\s+([^.]+)', re.IGNORECASE)
+]
+
+DATE_PATTERNS = [
+    re.compile(r'\d{4}-\d{2}-\d{2}', re.IGNORECASE),
+    re.compile(r'\d{1,2}/\d{1,2}/\d{4}', re.IGNORECASE),
+    re.compile(r'(January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{1,2},?\s+\d{4}', re.IGNORECASE)
+]
+
+NUMBER_PATTERNS = [
+    re.compile(r'\d+%'),  # Percentages
+    re.compile(r'\$[\d,]+'),  # Currency
+    re.compile(r'\d+\s*(days?|weeks?|months?)'),  # Time periods
+    re.compile(r'\d+\.\d+'),  # Decimals
+]
+
+# Matches API keys passed as URL query parameters (e.g. the Gemini endpoint)
+API_KEY_PATTERN = re.compile(r'((?:api_)?key=)[^&\s]+', re.IGNORECASE)
+
+def redact_secrets(message: str) -> str:
+    """Mask API keys embedded in error messages before they are logged"""
+    return API_KEY_PATTERN.sub(r'\1***', message)
+
+# Per-thread HTTP sessions, since requests.Session is not documented as thread-safe.
+# /upload-multiple runs analyses on a long-lived worker pool, so each worker's
+# session keeps its keep-alive connections across documents and requests
+_http_local = threading.local()
+
+# Seconds to wait on the Gemini API before giving up (connect, read)
+GEMINI_TIMEOUT = (10, 120)
+
+def get_http_session() -> requests.Session:
+    """Return this thread's HTTP session, creating it on first use"""
+    session = getattr(_http_local, 'session', None)
+    if session is None:
+        session = _http_local.session = requests.Session()
+    return session
+
+# Recent AI analyses keyed by document content, so re-uploading the same
+# document does not trigger another (slow, billed) API call
+ANALYSIS_CACHE_SIZE = 32
+_analysis_cache = OrderedDict()
+_analysis_cache_lock = threading.Lock()
+
+def get_cached_analysis(cache_key: str) -> Optional[Dict[str, Any]]:
+    """Return a copy of a cached AI analysis, or None on a miss"""
+    with _analysis_cache_lock:
+        analysis = _analysis_cache.get(cache_key)
+        if analysis is None:
+            return None
+        _analysis_cache.move_to_end(cache_key)
+    return copy.deepcopy(analysis)
+
+def store_cached_analysis(cache_key: str, analysis: Dict[str, Any]) -> None:
+    """Cache an AI analysis, evicting the least recently used entry when full"""
+    with _analysis_cache_lock:
+        _analysis_cache[cache_key] = copy.deepcopy(analysis)
+        _analysis_cache.move_to_end(cache_key)
+        while len(_analysis_cache) > ANALYSIS_CACHE_SIZE:
+            _analysis_cache.popitem(last=False)
+
 class AIDocumentAnalyzer:
     def __init__(self):
         self.openai_client = None
@@ -45,8 +145,8 @@ class AIDocumentAnalyzer:
         if gemini_key:
             self.gemini_api_key = gemini_key
     
-    def analyze_document(self, filepath: str) -> Dict[str, Any]:
-        """Main entry point for document analysis"""
+    def analyze_document(self, filepath: str, document_name: Optional[str] = None) -> Dict[str, Any]:
+        """Main entry point for document analysis; document_name defaults to the file's basename"""
         try:
             # Extract text from document
             text_content = self.extract_text_from_file(filepath)
@@ -55,7 +155,7 @@ class AIDocumentAnalyzer:
                 raise Exception("No text content could be extracted from the document")
             
             # Use AI to analyze the content
-            analysis_results = self.ai_analyze_content(text_content, filepath)
+            analysis_results = self.ai_analyze_content(text_content, document_name or os.path.basename(filepath))
             
             return {
                 'file_path': filepath,
@@ -69,45 +169,48 @@ class AIDocumentAnalyzer:
     
     def extract_text_from_file(self, filepath: str) -> str:
         """Extract text from various file formats"""
-        file_extension = filepath.lower().split('.')[-1]
+        file_extension = filepath.rpartition('.')[2].lower()
         
-        if file_extension == 'pdf':
-            return self.extract_from_pdf(filepath)
-        elif file_extension == 'docx':
-            return self.extract_from_docx(filepath)
-        elif file_extension in ['pptx', 'ppt']:
-            return self.extract_from_pptx(filepath)
-        else:
+        extractor = self.TEXT_EXTRACTORS.get(file_extension)
+        if extractor is None:
             raise Exception(f"Unsupported file type: {file_extension}")
+        
+        return extractor(self, filepath)
     
     def extract_from_pdf(self, filepath: str) -> str:
         """Extract text from PDF files"""
-        text = ""
+        parts = []
         try:
             with open(filepath, 'rb') as file:
                 pdf_reader = PyPDF2.PdfReader(file)
                 for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
+                    parts.append(page.extract_text())
+                    parts.append("\n")
         except Exception as e:
             raise Exception(f"PDF extraction failed: {str(e)}")
-        return text
+        return "".join(parts)
     
     def extract_from_docx(self, filepath: str) -> str:
         """Extract text from DOCX files"""
         try:
             doc = Document(filepath)
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
+            parts = []
+            paragraph_tag = qn('w:p')
+            table_tag = qn('w:tbl')
             
-            # Extract text from tables
-            for table in doc.tables:
-                for row in table.rows:
-                    for cell in row.cells:
-                        text += cell.text + " "
-                    text += "\n"
+            # Walk the body once so paragraphs and tables come out in document order
+            for child in doc.element.body.iterchildren():
+                if child.tag == paragraph_tag:
+                    parts.append(Paragraph(child, doc).text)
+                    parts.append("\n")
+                elif child.tag == table_tag:
+                    for row in Table(child, doc).rows:
+                        for cell in row.cells:
+                            parts.append(cell.text)
+                            parts.append(" ")
+                        parts.append("\n")
             
-            return text
+            return "".join(parts)
         except Exception as e:
             raise Exception(f"DOCX extraction failed: {str(e)}")
     
@@ -115,52 +218,80 @@ class AIDocumentAnalyzer:
         """Extract text from PPTX files"""
         try:
             presentation = Presentation(filepath)
-            text = ""
+            parts = []
             
             for slide_num, slide in enumerate(presentation.slides, 1):
-                text += f"\n--- Slide {slide_num} ---\n"
+                parts.append(f"\n--- Slide {slide_num} ---\n")
                 
                 for shape in slide.shapes:
                     if hasattr(shape, "text"):
-                        text += shape.text + "\n"
+                        parts.append(shape.text)
+                        parts.append("\n")
                     
                     # Extract text from tables in slides
                     if shape.has_table:
                         for row in shape.table.rows:
                             for cell in row.cells:
-                                text += cell.text + " "
-                            text += "\n"
+                                parts.append(cell.text)
+                                parts.append(" ")
+                            parts.append("\n")
             
-            return text
+            return "".join(parts)
         except Exception as e:
             raise Exception(f"PPTX extraction failed: {str(e)}")
     
-    def ai_analyze_content(self, text_content: str, filepath: str) -> Dict[str, Any]:
+    # File extension -> text extraction method that handles it
+    TEXT_EXTRACTORS = {
+        'pdf': extract_from_pdf,
+        'docx': extract_from_docx,
+        'pptx': extract_from_pptx,
+        'ppt': extract_from_pptx
+    }
+    
+    def ai_analyze_content(self, text_content: str, document_name: str) -> Dict[str, Any]:
         """Use AI to analyze document content for project insights"""
         
+        # The prompt includes the document name, so it is part of the cache key
+        cache_key = hashlib.sha256(
+            f"{document_name}\0{text_content}".encode('utf-8')
+        ).hexdigest()
+        cached_analysis = get_cached_analysis(cache_key)
+        if cached_analysis is not None:
+            log.debug("Using cached AI analysis")
+            return cached_analysis
+        
         # Create analysis prompt
-        analysis_prompt = self.create_analysis_prompt(text_content, filepath)
+        analysis_prompt = self.create_analysis_prompt(text_content, document_name)
         
         # Try available AI services in order of preference
         if self.anthropic_client:
-            print("Using Anthropic Claude for analysis...")
-            return self.analyze_with_claude(analysis_prompt)
+            log.debug("Using Anthropic Claude for analysis")
+            analysis = self.analyze_with_claude(analysis_prompt)
         elif self.gemini_api_key:
-            print("Using Google Gemini for analysis...")
-            return self.analyze_with_gemini(analysis_prompt)
+            log.debug("Using Google Gemini for analysis")
+            analysis = self.analyze_with_gemini(analysis_prompt)
         elif self.openai_client:
-            print("Using OpenAI for analysis...")
-            return self.analyze_with_openai(analysis_prompt)
+            log.debug("Using OpenAI for analysis")
+            analysis = self.analyze_with_openai(analysis_prompt)
         else:
-            print("No AI API keys available, using rule-based analysis...")
+            log.info("No AI API keys available, using rule-based analysis")
             return self.rule_based_analysis(text_content)
+        
+        # Fallback results carry an error marker; don't cache them so the next upload retries.
+        # The model may return document_metadata as null or a non-dict, which is not an error
+        if isinstance(analysis, dict):
+            metadata = analysis.get('document_metadata')
+            if not (isinstance(metadata, dict) and 'error' in metadata):
+                store_cached_analysis(cache_key, analysis)
+        
+        return analysis
     
-    def create_analysis_prompt(self, text_content: str, filepath: str) -> str:
+    def create_analysis_prompt(self, text_content: str, document_name: str) -> str:
         """Create a comprehensive analysis prompt"""
         return f"""
 You are an expert project management analyst. Analyze the following document content and extract key project insights.
 
-Document: {os.path.basename(filepath)}
+Document: {document_name}
 
 CONTENT TO ANALYZE:
 {text_content}
@@ -240,7 +371,7 @@ IMPORTANT:
             return self.extract_json_from_response(content)
             
         except Exception as e:
-            print(f"Claude analysis failed: {str(e)}")
+            log.error("Claude analysis failed: %s", e)
             return self.create_fallback_analysis("Claude API error")
     
     def analyze_with_openai(self, prompt: str) -> Dict[str, Any]:
@@ -266,7 +397,7 @@ IMPORTANT:
             return self.extract_json_from_response(content)
             
         except Exception as e:
-            print(f"OpenAI analysis failed: {str(e)}")
+            log.error("OpenAI analysis failed: %s", e)
             return self.create_fallback_analysis("OpenAI API error")
     
     def analyze_with_gemini(self, prompt: str) -> Dict[str, Any]:
@@ -290,7 +421,7 @@ IMPORTANT:
                 }
             }
             
-            response = requests.post(url, headers=headers, json=data)
+            response = get_http_session().post(url, headers=headers, json=data, timeout=GEMINI_TIMEOUT)
             response.raise_for_status()
             
             result = response.json()
@@ -301,7 +432,7 @@ IMPORTANT:
                 raise Exception("No response from Gemini API")
                 
         except Exception as e:
-            print(f"Gemini analysis failed: {str(e)}")
+            log.error("Gemini analysis failed: %s", redact_secrets(str(e)))
             return self.create_fallback_analysis("Gemini API error")
     
     def extract_json_from_response(self, content: str) -> Dict[str, Any]:
@@ -318,7 +449,7 @@ IMPORTANT:
                 raise Exception("No valid JSON found in response")
                 
         except Exception as e:
-            print(f"JSON extraction failed: {str(e)}")
+            log.warning("JSON extraction failed: %s", e)
             return self.create_fallback_analysis("JSON parsing error")
     
     def rule_based_analysis(self, text_content: str) -> Dict[str, Any]:
@@ -362,84 +493,50 @@ IMPORTANT:
     
     def extract_project_keywords(self, text: str) -> Dict[str, List[str]]:
         """Extract project-related keywords"""
-        completed_patterns = [
-            r'completed?\s+([^.]+)',
-            r'finished\s+([^.]+)',
-            r'done\s+([^.]+)'
-        ]
-        
-        in_progress_patterns = [
-            r'working on\s+([^.]+)',
-            r'in progress\s+([^.]+)',
-            r'currently\s+([^.]+)'
-        ]
-        
-        pending_patterns = [
-            r'planned?\s+([^.]+)',
-            r'upcoming\s+([^.]+)',
-            r'next\s+([^.]+)'
-        ]
-        
         return {
-            'completed': self.extract_with_patterns(text, completed_patterns),
-            'in_progress': self.extract_with_patterns(text, in_progress_patterns),
-            'pending': self.extract_with_patterns(text, pending_patterns)
+            'completed': self.extract_with_patterns(text, COMPLETED_PATTERNS),
+            'in_progress': self.extract_with_patterns(text, IN_PROGRESS_PATTERNS),
+            'pending': self.extract_with_patterns(text, PENDING_PATTERNS)
         }
     
-    def extract_with_patterns(self, text: str, patterns: List[str]) -> List[str]:
-        """Extract text using regex patterns"""
+    def extract_with_patterns(self, text: str, patterns: List[re.Pattern]) -> List[str]:
+        """Extract text using precompiled regex patterns"""
         results = []
         for pattern in patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            results.extend([match.strip() for match in matches])
-        return results[:5]  # Limit to 5 results
+            for match in pattern.finditer(text):
+                results.append(match.group(1).strip())
+                if len(results) == 5:  # Limit to 5 results
+                    return results
+        return results
     
     def extract_dates(self, text: str) -> List[str]:
         """Extract dates from text"""
-        date_patterns = [
-            r'\d{4}-\d{2}-\d{2}',
-            r'\d{1,2}/\d{1,2}/\d{4}',
-            r'(January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{1,2},?\s+\d{4}'
-        ]
-        
         dates = []
-        for pattern in date_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
+        for pattern in DATE_PATTERNS:
+            matches = pattern.findall(text)
             dates.extend(matches)
         
-        return list(set(dates))[:10]  # Unique dates, max 10
+        return list(dict.fromkeys(dates))[:10]  # Unique dates in first-seen order, max 10
     
     def extract_metrics(self, text: str) -> List[str]:
         """Extract potential metrics and KPIs"""
-        metric_keywords = [
-            'revenue', 'profit', 'cost', 'budget', 'roi', 'performance',
-            'efficiency', 'productivity', 'quality', 'satisfaction',
-            'completion rate', 'progress', 'milestone', 'target'
-        ]
-        
         metrics = []
-        for keyword in metric_keywords:
-            pattern = rf'{keyword}[:\s]*([^.]+)'
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            metrics.extend([f"{keyword}: {match.strip()}" for match in matches])
+        for keyword, pattern in METRIC_PATTERNS:
+            for match in pattern.finditer(text):
+                metrics.append(f"{keyword}: {match.group(1).strip()}")
+                if len(metrics) == 10:  # Max 10 metrics
+                    return metrics
         
-        return metrics[:10]  # Max 10 metrics
+        return metrics
     
     def extract_numbers(self, text: str) -> List[str]:
         """Extract numbers that might be targets or metrics"""
-        number_patterns = [
-            r'\d+%',  # Percentages
-            r'\$[\d,]+',  # Currency
-            r'\d+\s*(days?|weeks?|months?)',  # Time periods
-            r'\d+\.\d+',  # Decimals
-        ]
-        
         numbers = []
-        for pattern in number_patterns:
-            matches = re.findall(pattern, text)
+        for pattern in NUMBER_PATTERNS:
+            matches = pattern.findall(text)
             numbers.extend(matches)
         
-        return list(set(numbers))[:15]  # Unique numbers, max 15
+        return list(dict.fromkeys(numbers))[:15]  # Unique numbers in first-seen order, max 15
     
     def create_fallback_analysis(self, error_reason: str) -> Dict[str, Any]:
         """Create a basic analysis structure when AI fails"""
@@ -1,7 +1,25 @@
+import re
+import heapq
 import plotly.graph_objs as go
-import plotly.utils
 import json
-from datetime import datetime
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Status labels that count as completed work
+COMPLETED_STATUS_PATTERN = re.compile(r'done|complete|finished|resolved|closed', re.IGNORECASE)
+
+# Most charts shown on the combined multi-file dashboard
+MAX_DASHBOARD_CHARTS = 6
+
+def figure_to_dict(fig):
+    """Convert a Plotly figure to a JSON-safe dict for the dashboard payload"""
+    # fig.to_json() uses plotly's orjson engine when orjson is installed
+    fig_json = fig.to_json()
+    return orjson.loads(fig_json) if ORJSON_AVAILABLE else json.loads(fig_json)
 
 class ReportGenerator:
     def __init__(self):
@@ -116,7 +134,7 @@ class ReportGenerator:
                 'id': 'status_chart',
                 'title': 'Task Status Distribution',
                 'type': 'pie',
-                'data': json.loads(plotly.utils.PlotlyJSONEncoder().encode(fig))
+                'data': figure_to_dict(fig)
             })
         
         # Priority breakdown bar chart
@@ -141,7 +159,7 @@ class ReportGenerator:
                 'id': 'priority_chart',
                 'title': 'Task Priority Distribution',
                 'type': 'bar',
-                'data': json.loads(plotly.utils.PlotlyJSONEncoder().encode(fig))
+                'data': figure_to_dict(fig)
             })
         
         # Team workload chart
@@ -150,7 +168,7 @@ class ReportGenerator:
             team_data = team_analysis['task_distribution']
             
             # Get top 10 team members by task count
-            sorted_team = sorted(team_data.items(), key=lambda x: x[1], reverse=True)[:10]
+            sorted_team = heapq.nlargest(10, team_data.items(), key=lambda x: x[1])
             
             fig = go.Figure(data=[go.Bar(
                 x=[item[1] for item in sorted_team],
@@ -171,7 +189,7 @@ class ReportGenerator:
                 'id': 'team_chart',
                 'title': 'Team Workload Distribution',
                 'type': 'bar',
-                'data': json.loads(plotly.utils.PlotlyJSONEncoder().encode(fig))
+                'data': figure_to_dict(fig)
             })
         
         return charts
@@ -195,8 +213,7 @@ class ReportGenerator:
             total_tasks = sum(status_data.values())
             
             # Look for completion indicators
-            completed_keys = [k for k in status_data.keys() if any(word in str(k).lower() 
-                            for word in ['done', 'complete', 'finished', 'resolved', 'closed'])]
+            completed_keys = [k for k in status_data if COMPLETED_STATUS_PATTERN.search(str(k))]
             
             if completed_keys:
                 completed_count = sum(status_data[k] for k in completed_keys)
@@ -266,64 +283,67 @@ class ReportGenerator:
         all_charts = []
         all_insights = []
         
-        # Process spreadsheet analyses
-        for analysis in combined_data.get('spreadsheet_analyses', []):
-            cards = self._create_summary_cards(analysis)
-            charts = self._create_charts(analysis)
-            insights = self._generate_insights(analysis)
+        # Spreadsheet and document analyses differ only in which builders they feed
+        spreadsheet_builders = (self._create_summary_cards, self._create_charts, self._generate_insights)
+        document_builders = (self._create_document_summary_cards, self._create_document_charts, self._generate_document_insights)
+        
+        analyses = [
+            (analysis, analysis, spreadsheet_builders)
+            for analysis in combined_data.get('spreadsheet_analyses', [])
+        ] + [
+            (analysis, analysis.get('ai_analysis', {}), document_builders)
+            for analysis in combined_data.get('document_analyses', [])
+        ]
+        
+        # Process every analysis in a single pass
+        for analysis, source_data, (build_cards, build_charts, build_insights) in analyses:
+            cards = build_cards(source_data)
+            # Charts beyond the dashboard limit are dropped, so don't build them
+            charts = build_charts(source_data) if len(all_charts) < MAX_DASHBOARD_CHARTS else []
+            insights = build_insights(source_data)
             
             # Add source file info to each item
-            for card in cards:
-                card['source_file'] = analysis.get('source_file', 'Unknown')
-            for chart in charts:
-                chart['source_file'] = analysis.get('source_file', 'Unknown')
-                chart['id'] = f"{chart['id']}_{analysis.get('source_file', 'unknown').replace('.', '_')}"
-            for insight in insights:
-                insight['source_file'] = analysis.get('source_file', 'Unknown')
+            self._tag_source_file(analysis, cards, charts, insights)
             
             all_summary_cards.extend(cards)
             all_charts.extend(charts)
             all_insights.extend(insights)
         
-        # Process document analyses
-        for analysis in combined_data.get('document_analyses', []):
-            ai_analysis = analysis.get('ai_analysis', {})
-            cards = self._create_document_summary_cards(ai_analysis)
-            charts = self._create_document_charts(ai_analysis)
-            insights = self._generate_document_insights(ai_analysis)
-            
-            # Add source file info
-            for card in cards:
-                card['source_file'] = analysis.get('source_file', 'Unknown')
-            for chart in charts:
-                chart['source_file'] = analysis.get('source_file', 'Unknown')
-                chart['id'] = f"{chart['id']}_{analysis.get('source_file', 'unknown').replace('.', '_')}"
-            for insight in insights:
-                insight['source_file'] = analysis.get('source_file', 'Unknown')
-            
-            all_summary_cards.extend(cards)
-            all_charts.extend(charts)
-            all_insights.extend(insights)
+        # Distinct file types in upload order, shared by the cards, insights and payload
+        file_types = list(dict.fromkeys(combined_data.get('analysis_types', [])))
         
         # Create combined overview cards
-        combined_overview = self._create_combined_overview_cards(combined_data)
+        combined_overview = self._create_combined_overview_cards(combined_data, file_types)
         
         # Add combined insights
-        combined_insights = self._generate_combined_insights(combined_data)
+        combined_insights = self._generate_combined_insights(combined_data, file_types)
         
         dashboard_data = {
             'summary_cards': combined_overview + all_summary_cards[:8],  # Limit total cards
-            'charts': all_charts[:6],  # Limit total charts
+            'charts': all_charts[:MAX_DASHBOARD_CHARTS],  # Limit total charts
             'insights': combined_insights + all_insights[:10],  # Limit total insights
             'raw_data': combined_data,
             'analysis_type': 'combined',
             'files_processed': len(combined_data.get('file_info', [])),
-            'file_types': list(set(combined_data.get('analysis_types', [])))
+            'file_types': file_types
         }
         
         return dashboard_data
     
-    def _create_combined_overview_cards(self, combined_data):
+    def _tag_source_file(self, analysis, cards, charts, insights):
+        """Attach the originating file name to each card, chart and insight"""
+        source_file = analysis.get('source_file', 'Unknown')
+        chart_suffix = analysis.get('source_file', 'unknown').replace('.', '_')
+        
+        for card in cards:
+            card['source_file'] = source_file
+        for chart in charts:
+            chart['source_file'] = source_file
+            chart['id'] = f"{chart['id']}_{chart_suffix}"
+        for insight in insights:
+            insight['source_file'] = source_file
+    
+    def _create_combined_overview_cards(self, combined_data, file_types):
         """Create overview cards for combined analysis"""
         cards = []
         
@@ -338,7 +358,6 @@ class ReportGenerator:
         })
         
         # File types
-        file_types = list(set(combined_data.get('analysis_types', [])))
         cards.append({
             'title': 'File Types',
             'value': str(len(file_types)),
@@ -360,7 +379,7 @@ class ReportGenerator:
         
         return cards
     
-    def _generate_combined_insights(self, combined_data):
+    def _generate_combined_insights(self, combined_data, file_types):
         """Generate insights from combined analysis"""
         insights = []
         
@@ -377,7 +396,6 @@ class ReportGenerator:
             })
         
         # File diversity insight
-        file_types = list(set(combined_data.get('analysis_types', [])))
         if len(file_types) > 3:
             insights.append({
                 'type': 'info',
@@ -471,7 +489,7 @@ class ReportGenerator:
                 'id': 'document_status_chart',
                 'title': 'Task Status Distribution',
                 'type': 'pie',
-                'data': json.loads(plotly.utils.PlotlyJSONEncoder().encode(fig))
+                'data': figure_to_dict(fig)
             })
         
         # Team workload
@@ -498,7 +516,7 @@ class ReportGenerator:
                 'id': 'document_team_chart',
                 'title': 'Team Members',
                 'type': 'bar',
-                'data': json.loads(plotly.utils.PlotlyJSONEncoder().encode(fig))
+                'data': figure_to_dict(fig)
             })
         
         # KPIs and Metrics
@@ -507,7 +525,7 @@ class ReportGenerator:
         
         if metrics:
             # Create a horizontal bar chart of metrics
-            metric_names = [metric.split(':')[0] if ':' in metric else metric for metric in metrics[:8]]
+            metric_names = [metric.partition(':')[0] for metric in metrics[:8]]
             metric_counts = [1] * len(metric_names)  # Each metric counts as 1
             
             fig = go.Figure(data=[go.Bar(
@@ -529,7 +547,7 @@ class ReportGenerator:
                 'id': 'document_kpi_chart',
                 'title': 'Key Performance Indicators',
                 'type': 'bar',
-                'data': json.loads(plotly.utils.PlotlyJSONEncoder().encode(fig))
+                'data': figure_to_dict(fig)
             })
         
         return charts
@@ -1,62 +1,93 @@
+import re
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
 import json
 
+# Keywords used to recognise columns by name, grouped by what the column holds
+COLUMN_KEYWORDS = {
+    'task': ['task', 'title', 'summary', 'description', 'issue', 'key', 'subject'],
+    'status': ['status', 'state', 'progress', 'resolution'],
+    'priority': ['priority', 'severity', 'importance'],
+    'completion': ['complete', 'done', 'finished', 'resolved', 'closed'],
+    'progress': ['progress', 'percent', '%'],
+    'assignee': ['assignee', 'assigned', 'owner', 'responsible', 'team', 'reporter', 'creator'],
+    'date': ['date', 'time', 'created', 'updated', 'due', 'start', 'end', 'deadline']
+}
+
+# One case-insensitive alternation per group, compiled once at import
+COLUMN_PATTERNS = {
+    group: re.compile('|'.join(re.escape(keyword) for keyword in keywords), re.IGNORECASE)
+    for group, keywords in COLUMN_KEYWORDS.items()
+}
+
+# Cell values (lowercased) that mark a row as completed
+COMPLETION_INDICATORS = frozenset(['done', 'complete', 'finished', 'resolved', 'closed', 'yes', 'true'])
+
 class SpreadsheetAnalyzer:
     def __init__(self):
         self.data = None
         self.analysis_results = {}
+        self._column_groups = {}
     
     def analyze_file(self, filepath):
         """Analyze uploaded spreadsheet file"""
         try:
             # Read file based on extension
             if filepath.endswith('.csv'):
-                self.data = pd.read_csv(filepath)
+                data = pd.read_csv(filepath)
             elif filepath.endswith('.json'):
                 # Handle JSON files
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    json_data = json.load(f)
+                # Read raw bytes; json.loads detects the encoding and tolerates a UTF-8 BOM
+                with open(filepath, 'rb') as f:
+                    json_data = json.loads(f.read())
                 
                 # Convert JSON to DataFrame
                 if isinstance(json_data, list):
                     # If JSON is a list of objects
-                    self.data = pd.DataFrame(json_data)
+                    data = pd.DataFrame(json_data)
                 elif isinstance(json_data, dict):
                     # Check if it's a nested structure with data arrays
                     if 'issues' in json_data:  # JIRA export format
-                        self.data = pd.DataFrame(json_data['issues'])
+                        data = pd.DataFrame(json_data['issues'])
                     elif 'data' in json_data:  # Generic data wrapper
-                        self.data = pd.DataFrame(json_data['data'])
+                        data = pd.DataFrame(json_data['data'])
                     else:
                         # Try to normalize the dictionary
-                        self.data = pd.json_normalize(json_data)
+                        data = pd.json_normalize(json_data)
                 else:
                     raise Exception("JSON format not supported - must be list of objects or dictionary")
                     
             else:  # xlsx, xls
-                self.data = pd.read_excel(filepath)
-            
-            # Ensure we have data
-            if self.data.empty:
-                raise Exception("No data found in file")
-            
-            # Perform comprehensive analysis
-            self.analysis_results = {
-                'file_info': self._get_file_info(),
-                'data_summary': self._get_data_summary(),
-                'task_analysis': self._analyze_tasks(),
-                'timeline_analysis': self._analyze_timeline(),
-                'completion_analysis': self._analyze_completion(),
-                'team_analysis': self._analyze_team_performance()
-            }
+                data = pd.read_excel(filepath)
             
-            return self.analysis_results
+            return self.analyze_dataframe(data)
             
         except Exception as e:
             raise Exception(f"Error analyzing file: {str(e)}")
     
+    def analyze_dataframe(self, data):
+        """Analyze an already-loaded DataFrame without re-reading it from disk"""
+        self.data = data
+        
+        # Ensure we have data
+        if self.data.empty:
+            raise Exception("No data found in file")
+        
+        # Classify column names once; every analysis section reads from this
+        self._column_groups = self._classify_columns()
+        
+        # Perform comprehensive analysis
+        self.analysis_results = {
+            'file_info': self._get_file_info(),
+            'data_summary': self._get_data_summary(),
+            'task_analysis': self._analyze_tasks(),
+            'timeline_analysis': self._analyze_timeline(),
+            'completion_analysis': self._analyze_completion(),
+            'team_analysis': self._analyze_team_performance()
+        }
+        
+        return self.analysis_results
+    
     def _get_file_info(self):
         """Get basic file information"""
         return {
@@ -68,16 +99,19 @@ class SpreadsheetAnalyzer:
     
     def _get_data_summary(self):
         """Get summary statistics"""
-        numeric_cols = self.data.select_dtypes(include=[np.number]).columns
+        numeric_data = self.data.select_dtypes(include=[np.number])
         summary = {}
         
-        for col in numeric_cols:
+        if numeric_data.columns.empty:
+            return summary
+        
+        # Compute every statistic for every numeric column in one aggregation
+        stats = numeric_data.agg(['mean', 'median', 'std', 'min', 'max'])
+        
+        for col in stats.columns:
             summary[col] = {
-                'mean': float(self.data[col].mean()) if not pd.isna(self.data[col].mean()) else None,
-                'median': float(self.data[col].median()) if not pd.isna(self.data[col].median()) else None,
-                'std': float(self.data[col].std()) if not pd.isna(self.data[col].std()) else None,
-                'min': float(self.data[col].min()) if not pd.isna(self.data[col].min()) else None,
-                'max': float(self.data[col].max()) if not pd.isna(self.data[col].max()) else None
+                stat: float(value) if not pd.isna(value) else None
+                for stat, value in stats[col].items()
             }
         
         return summary
@@ -87,9 +121,9 @@ class SpreadsheetAnalyzer:
         task_analysis = {}
         
         # Look for common task-related column names
-        task_columns = self._find_columns(['task', 'title', 'summary', 'description', 'issue', 'key', 'subject'])
-        status_columns = self._find_columns(['status', 'state', 'progress', 'resolution'])
-        priority_columns = self._find_columns(['priority', 'severity', 'importance'])
+        task_columns = self._find_columns('task')
+        status_columns = self._find_columns('status')
+        priority_columns = self._find_columns('priority')
         
         if task_columns:
             task_col = task_columns[0]
@@ -113,7 +147,7 @@ class SpreadsheetAnalyzer:
         timeline_analysis = {}
         
         # Look for date columns
-        date_columns = self._find_date_columns()
+        date_columns = self._find_columns('date')
         
         if date_columns:
             for date_col in date_columns[:2]:  # Analyze up to 2 date columns
@@ -122,10 +156,12 @@ class SpreadsheetAnalyzer:
                     valid_dates = dates.dropna()
                     
                     if len(valid_dates) > 0:
+                        earliest = valid_dates.min()
+                        latest = valid_dates.max()
                         timeline_analysis[f'{date_col}_analysis'] = {
-                            'earliest': valid_dates.min().isoformat(),
-                            'latest': valid_dates.max().isoformat(),
-                            'span_days': (valid_dates.max() - valid_dates.min()).days,
+                            'earliest': earliest.isoformat(),
+                            'latest': latest.isoformat(),
+                            'span_days': (latest - earliest).days,
                             'valid_dates': len(valid_dates),
                             'missing_dates': len(dates) - len(valid_dates)
                         }
@@ -139,8 +175,8 @@ class SpreadsheetAnalyzer:
         completion_analysis = {}
         
         # Look for completion indicators
-        completion_columns = self._find_columns(['complete', 'done', 'finished', 'resolved', 'closed'])
-        progress_columns = self._find_columns(['progress', 'percent', '%'])
+        completion_columns = self._find_columns('completion')
+        progress_columns = self._find_columns('progress')
         
         if completion_columns:
             for col in completion_columns:
@@ -161,34 +197,30 @@ class SpreadsheetAnalyzer:
         team_analysis = {}
         
         # Look for assignee/team member columns
-        assignee_columns = self._find_columns(['assignee', 'assigned', 'owner', 'responsible', 'team', 'reporter', 'creator'])
+        assignee_columns = self._find_columns('assignee')
         
         if assignee_columns:
             assignee_col = assignee_columns[0]
             team_counts = self.data[assignee_col].value_counts().to_dict()
             team_analysis['task_distribution'] = team_counts
-            team_analysis['team_size'] = self.data[assignee_col].nunique()
+            # value_counts already drops NaN, so its length equals nunique()
+            team_analysis['team_size'] = len(team_counts)
         
         return team_analysis
     
-    def _find_columns(self, keywords):
-        """Find columns that contain any of the given keywords"""
-        found_columns = []
+    def _classify_columns(self):
+        """Match every column name against all keyword groups in a single pass"""
+        column_groups = {group: [] for group in COLUMN_PATTERNS}
         for col in self.data.columns:
-            col_lower = str(col).lower()
-            if any(keyword.lower() in col_lower for keyword in keywords):
-                found_columns.append(col)
-        return found_columns
+            col_name = str(col)
+            for group, pattern in COLUMN_PATTERNS.items():
+                if pattern.search(col_name):
+                    column_groups[group].append(col)
+        return column_groups
     
-    def _find_date_columns(self):
-        """Find columns that likely contain dates"""
-        date_columns = []
-        for col in self.data.columns:
-            col_lower = str(col).lower()
-            date_keywords = ['date', 'time', 'created', 'updated', 'due', 'start', 'end', 'deadline']
-            if any(keyword in col_lower for keyword in date_keywords):
-                date_columns.append(col)
-        return date_columns
+    def _find_columns(self, group):
+        """Find columns whose name contains any keyword of the given COLUMN_KEYWORDS group"""
+        return self._column_groups.get(group, [])
     
     def _calculate_completion_rate(self, series):
         """Calculate completion rate for a boolean or categorical series"""
@@ -196,6 +228,5 @@ class SpreadsheetAnalyzer:
             return float(series.sum() / len(series)) * 100
         else:
             # Look for completion indicators in text
-            completion_indicators = ['done', 'complete', 'finished', 'resolved', 'closed', 'yes', 'true']
-            completed = series.astype(str).str.lower().isin(completion_indicators)
+            completed = series.astype(str).str.lower().isin(COMPLETION_INDICATORS)
             return float(completed.sum() / len(series)) * 100
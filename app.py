@@ -1,7 +1,7 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import Flask, render_template, request, jsonify
 import os
-import pandas as pd
-import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
 import glob
 from werkzeug.utils import secure_filename
 from analyzers.spreadsheet_analyzer import SpreadsheetAnalyzer
@@ -12,18 +12,67 @@ try:
     AI_AVAILABLE = True
 except ImportError:
     AI_AVAILABLE = False
-    print("AI document analyzer not available - will use basic analysis")
+
+log = logging.getLogger(__name__)
+
+if not AI_AVAILABLE:
+    log.warning("AI document analyzer not available - will use basic analysis")
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 32 * 1024 * 1024  # 32MB for documents
 
+# Dashboard payloads embed full Plotly figures and raw analysis data; skip
+# key sorting and pretty-printing (enabled under debug) when serialising them
+app.json.sort_keys = False
+app.json.compact = True
+
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv', 'json', 'pdf', 'docx', 'pptx'}
+SPREADSHEET_EXTENSIONS = frozenset({'xlsx', 'xls', 'csv', 'json'})
+DOCUMENT_EXTENSIONS = frozenset({'pdf', 'docx', 'pptx'})
+ALLOWED_EXTENSIONS = SPREADSHEET_EXTENSIONS | DOCUMENT_EXTENSIONS
+
+# Upper bound on files analyzed concurrently by /upload-multiple
+MAX_ANALYSIS_WORKERS = 4
+
+# Shared across requests so worker threads (and the per-thread AI API sessions
+# they hold) outlive a single upload instead of being torn down after each one
+analysis_executor = ThreadPoolExecutor(max_workers=MAX_ANALYSIS_WORKERS, thread_name_prefix='analysis')
+
+def get_file_extension(filename):
+    """Return the lowercased extension of filename, or '' if it has none"""
+    _, dot, extension = filename.rpartition('.')
+    return extension.lower() if dot else ''
 
 def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    return get_file_extension(filename) in ALLOWED_EXTENSIONS
+
+def analyze_upload(filepath, file_extension, filename):
+    """Run the analyzer matching file_extension on the upload saved as filepath; returns (analysis_results, analysis_type)"""
+    if file_extension in SPREADSHEET_EXTENSIONS:
+        # Use spreadsheet analyzer for data files
+        log.debug("Using spreadsheet analyzer for %s", filepath)
+        return SpreadsheetAnalyzer().analyze_file(filepath), 'spreadsheet'
+    
+    if file_extension in DOCUMENT_EXTENSIONS:
+        if not AI_AVAILABLE:
+            raise Exception("Document analysis requires AI libraries. Please set up API keys or use spreadsheet files.")
+        # Use AI document analyzer for documents
+        log.debug("Using AI document analyzer for %s", filepath)
+        return AIDocumentAnalyzer().analyze_document(filepath, filename), 'document'
+    
+    raise Exception(f"Unsupported file type: {file_extension}")
+
+def analyze_saved_file(filepath, file_extension, filename):
+    """Analyze a saved upload and remove it; returns (analysis_results, analysis_type, file_size)"""
+    try:
+        file_size = os.path.getsize(filepath)
+        analysis_results, analysis_type = analyze_upload(filepath, file_extension, filename)
+        return analysis_results, analysis_type, file_size
+    finally:
+        if os.path.exists(filepath):
+            os.remove(filepath)
 
 @app.route('/')
 def dashboard():
@@ -31,61 +80,37 @@ def dashboard():
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
-    print("=== SINGLE FILE UPLOAD ROUTE CALLED ===")
-    print(f"Request files: {request.files}")
-    print(f"Request method: {request.method}")
+    log.debug("Single file upload: %s", request.files)
     
     if 'file' not in request.files:
-        print("No file in request")
+        log.debug("No file in request")
         return jsonify({'error': 'No file selected'}), 400
     
     file = request.files['file']
-    print(f"File received: {file.filename}")
+    log.debug("File received: %s", file.filename)
     
     if file.filename == '':
-        print("Empty filename")
+        log.debug("Empty filename")
         return jsonify({'error': 'No file selected'}), 400
     
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        print(f"Saving file to: {filepath}")
+        log.debug("Saving file to: %s", filepath)
         file.save(filepath)
         
         try:
-            print("Starting analysis...")
-            
             # Determine file type and use appropriate analyzer
-            file_extension = filename.lower().split('.')[-1]
-            print(f"DEBUG: File extension detected: '{file_extension}'")
-            print(f"DEBUG: Checking if '{file_extension}' in ['xlsx', 'xls', 'csv', 'json']")
-            
-            if file_extension in ['xlsx', 'xls', 'csv', 'json']:
-                # Use spreadsheet analyzer for data files
-                print(f"DEBUG: Using spreadsheet analyzer for {file_extension}")
-                analyzer = SpreadsheetAnalyzer()
-                analysis_results = analyzer.analyze_file(filepath)
-                analysis_type = "spreadsheet"
-                
-            elif file_extension in ['pdf', 'docx', 'pptx'] and AI_AVAILABLE:
-                # Use AI document analyzer for documents
-                print("Using AI document analyzer...")
-                analyzer = AIDocumentAnalyzer()
-                analysis_results = analyzer.analyze_document(filepath)
-                analysis_type = "document"
-                
-            elif file_extension in ['pdf', 'docx', 'pptx'] and not AI_AVAILABLE:
-                raise Exception("Document analysis requires AI libraries. Please set up API keys or use spreadsheet files.")
-                
-            else:
-                raise Exception(f"Unsupported file type: {file_extension}")
+            file_extension = get_file_extension(filename)
+            log.debug("File extension detected: %r", file_extension)
+            analysis_results, analysis_type = analyze_upload(filepath, file_extension, filename)
             
-            print("Analysis complete!")
+            log.debug("Analysis complete: %s", filename)
             
             # Generate dashboard data
             report_gen = ReportGenerator()
             dashboard_data = report_gen.generate_dashboard_data(analysis_results, analysis_type)
-            print("Report generation complete!")
+            log.debug("Report generation complete: %s", filename)
             
             # Clean up
             os.remove(filepath)
@@ -97,23 +122,22 @@ def upload_file():
             })
             
         except Exception as e:
-            print(f"Analysis error: {str(e)}")
+            log.error("Analysis error for %s: %s", filename, e)
             if os.path.exists(filepath):
                 os.remove(filepath)
             return jsonify({'error': f'Analysis failed: {str(e)}'}), 500
     
-    print("Invalid file type")
+    log.debug("Invalid file type: %s", file.filename)
     return jsonify({'error': 'Invalid file type. Supported: Excel, CSV, JSON, PDF, Word, PowerPoint'}), 400
 
 @app.route('/upload-multiple', methods=['POST'])
 def upload_multiple_files():
-    print("=== MULTIPLE FILE UPLOAD ROUTE CALLED ===")
     
     if 'files' not in request.files:
         return jsonify({'error': 'No files selected'}), 400
     
     files = request.files.getlist('files')
-    print(f"Number of files received: {len(files)}")
+    log.debug("Multiple file upload: %d files received", len(files))
     
     if not files or all(file.filename == '' for file in files):
         return jsonify({'error': 'No files selected'}), 400
@@ -129,69 +153,64 @@ def upload_multiple_files():
     processed_files = 0
     
     try:
+        # Save every upload first; the request stream is only readable from this thread
+        saved_files = []
         for file_index, file in enumerate(files):
             if not file or file.filename == '':
                 continue
                 
             if not allowed_file(file.filename):
-                print(f"Skipping unsupported file: {file.filename}")
+                log.debug("Skipping unsupported file: %s", file.filename)
                 continue
             
             filename = secure_filename(file.filename)
+            file_extension = get_file_extension(filename)
+            
+            if file_extension in DOCUMENT_EXTENSIONS and not AI_AVAILABLE:
+                log.warning("Skipping %s - AI analysis not available", filename)
+                continue
+            
             filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{file_index}_{filename}")
-            print(f"Processing file {file_index + 1}: {filename}")
+            log.debug("Processing file %d: %s", file_index + 1, filename)
             
             file.save(filepath)
-            
+            saved_files.append((filename, file_extension, filepath))
+        
+        # Files are independent and document analysis mostly waits on AI API
+        # calls, so analyze them concurrently; each worker removes its own file
+        futures = [
+            analysis_executor.submit(analyze_saved_file, filepath, file_extension, filename)
+            for filename, file_extension, filepath in saved_files
+        ]
+        
+        # Collect results in upload order
+        for (filename, file_extension, _), future in zip(saved_files, futures):
             try:
-                # Determine file type and analyze
-                file_extension = filename.lower().split('.')[-1]
-                
-                if file_extension in ['xlsx', 'xls', 'csv', 'json']:
-                    print(f"Using spreadsheet analyzer for {filename}")
-                    analyzer = SpreadsheetAnalyzer()
-                    analysis_result = analyzer.analyze_file(filepath)
-                    analysis_result['source_file'] = filename
-                    analysis_result['analysis_type'] = 'spreadsheet'
-                    combined_data['spreadsheet_analyses'].append(analysis_result)
-                    
-                elif file_extension in ['pdf', 'docx', 'pptx'] and AI_AVAILABLE:
-                    print(f"Using AI document analyzer for {filename}")
-                    analyzer = AIDocumentAnalyzer()
-                    analysis_result = analyzer.analyze_document(filepath)
-                    analysis_result['source_file'] = filename
-                    analysis_result['analysis_type'] = 'document'
-                    combined_data['document_analyses'].append(analysis_result)
-                    
-                elif file_extension in ['pdf', 'docx', 'pptx'] and not AI_AVAILABLE:
-                    print(f"Skipping {filename} - AI analysis not available")
-                    continue
-                
-                # Add to file info
-                combined_data['file_info'].append({
-                    'filename': filename,
-                    'type': file_extension,
-                    'size': os.path.getsize(filepath)
-                })
-                combined_data['analysis_types'].append(file_extension)
-                processed_files += 1
-                
-                # Clean up individual file
-                os.remove(filepath)
-                print(f"Successfully analyzed: {filename}")
-                
+                analysis_result, analysis_type, file_size = future.result()
             except Exception as e:
-                print(f"Error analyzing {filename}: {str(e)}")
-                if os.path.exists(filepath):
-                    os.remove(filepath)
+                log.error("Error analyzing %s: %s", filename, e)
                 # Continue with other files instead of failing completely
                 continue
+            
+            analysis_result['source_file'] = filename
+            analysis_result['analysis_type'] = analysis_type
+            combined_data[f'{analysis_type}_analyses'].append(analysis_result)
+            
+            # Add to file info
+            combined_data['file_info'].append({
+                'filename': filename,
+                'type': file_extension,
+                'size': file_size
+            })
+            combined_data['analysis_types'].append(file_extension)
+            processed_files += 1
+            log.debug("Successfully analyzed: %s", filename)
         
         if processed_files == 0:
             return jsonify({'error': 'No files could be analyzed successfully'}), 400
         
         # Generate combined dashboard
-        print("Generating combined dashboard...")
+        log.debug("Generating combined dashboard for %d files", processed_files)
         report_gen = ReportGenerator()
         
         # Check if we have the combined dashboard method
@@ -218,7 +237,7 @@ def upload_multiple_files():
         })
         
     except Exception as e:
-        print(f"Multiple file analysis error: {str(e)}")
+        log.error("Multiple file analysis error: %s", e)
         
         # Clean up any remaining files
         cleanup_pattern = os.path.join(app.config['UPLOAD_FOLDER'], "*_*")
@@ -239,5 +258,6 @@ def test():
     return "Flask app is working!"
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=True)